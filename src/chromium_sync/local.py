@@ -21,6 +21,10 @@ import plyvel
 # Chromium epoch starts at 1601-01-01, need to convert to Unix epoch
 CHROMIUM_EPOCH_OFFSET = 11644473600000000  # microseconds
 
+# Patterns for scraping session and sync data, compiled once at import
+_URL_RE = re.compile(rb"https?://[^\x00-\x1f\x7f-\xff\"<>]+")
+_PRINTABLE_STRING_RE = re.compile(rb"[\x20-\x7e]{3,80}")
+
 
 def chromium_time_to_datetime(chromium_time: int) -> datetime | None:
     """Convert Chromium timestamp to datetime."""
@@ -422,7 +426,7 @@ class LocalReader:
                     data = f.read()
 
                 # Extract URLs from the session data
-                urls = re.findall(rb"https?://[^\x00-\x1f\x7f-\xff\"<>]+", data)
+                urls = _URL_RE.findall(data)
                 for url in urls:
                     url_str = url.decode("utf-8", errors="replace")
                     if "/favicon" in url_str or url_str in seen_urls:
@@ -440,7 +444,7 @@ class LocalReader:
                 with open(temp_file, "rb") as f:
                     data = f.read()
 
-                urls = re.findall(rb"https?://[^\x00-\x1f\x7f-\xff\"<>]+", data)
+                urls = _URL_RE.findall(data)
                 for url in urls:
                     url_str = url.decode("utf-8", errors="replace")
                     if "/favicon" in url_str or url_str in seen_urls:
@@ -488,7 +492,7 @@ class LocalReader:
     def _parse_device_info(self, value: bytes, device_id: str) -> Device | None:
         """Parse device info from LevelDB value."""
         # Extract readable strings to find device name and type
-        strings = re.findall(rb"[\x20-\x7e]{3,80}", value)
+        strings = _PRINTABLE_STRING_RE.findall(value)
 
         name = None
         device_type = "unknown"
@@ -526,7 +530,7 @@ class LocalReader:
         for device_id, device in devices_map.items():
             if device_id.encode() in value:
                 # Extract URLs and titles from the protobuf data
-                urls = re.findall(rb"https?://[^\x00-\x1f\x7f-\xff\"<>]+", value)
+                urls = _URL_RE.findall(value)
 
                 for url in urls:
                     url_str = url.decode("utf-8", errors="replace")
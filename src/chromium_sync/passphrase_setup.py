@@ -9,12 +9,15 @@ Architecture:
   Xvnc (virtual X + VNC) → Chrome/Brave → noVNC (web client) → cloudflared tunnel
 """
 
+import asyncio
 import atexit
-import io
+import codecs
+import fcntl
 import os
 import platform
 import re
 import secrets
+import selectors
 import shutil
 import signal
 import stat
@@ -24,16 +27,27 @@ import sys
 import time
 import urllib.request
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import IO
 
 CACHE_DIR = Path.home() / ".cache" / "chromium-sync"
 CLOUDFLARED_VERSION = "2024.12.2"
 NOVNC_VERSION = "1.5.0"
 
+# Platform details used to pick the cloudflared release to download
+_SYSTEM = platform.system().lower()
+_MACHINE = platform.machine().lower()
+_CLOUDFLARED_ARCHES = {"x86_64": "amd64", "aarch64": "arm64", "arm64": "arm64"}
+
+_TUNNEL_URL_RE = re.compile(r"https://[a-zA-Z0-9-]+\.trycloudflare\.com")
+
 
 class ManagedProcess:
     """A process with a name for logging."""
 
+    __slots__ = ("name", "proc", "pid", "reported_dead")
+
     def __init__(self, name: str, proc: subprocess.Popen):
         self.name = name
         self.proc = proc
@@ -41,17 +55,37 @@ class ManagedProcess:
         self.reported_dead = False
 
 
+async def _wait_for_pidfd(mp: ManagedProcess, pidfd: int) -> ManagedProcess:
+    """Wait for the process behind a pidfd to exit, then reap it."""
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+
+    def on_exit():
+        if not exited.done():
+            exited.set_result(None)
+
+    loop.add_reader(pidfd, on_exit)
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+
+    mp.proc.poll()  # Reap the child and record its exit code
+    return mp
+
+
 class SetupSession:
     """Manages the lifecycle of all spawned processes."""
 
     def __init__(self):
         self.processes: list[ManagedProcess] = []
         self.temp_dirs: list[Path] = []
-        self.log_files: list[io.IOBase] = []
         self.display = ":99"
         self.cleaned_up = False
         self.log_dir = Path("/tmp/chromium-sync-setup")
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_dir_fd = os.open(self.log_dir, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
 
     def spawn(
         self, cmd: list[str], name: str, env: dict | None = None, **kwargs
@@ -60,29 +94,72 @@ class SetupSession:
         if env:
             full_env.update(env)
 
-        # Log stdout/stderr to files unless caller provides their own
-        if "stdout" not in kwargs:
-            stdout_log = open(self.log_dir / f"{name}.stdout.log", "w")
-            self.log_files.append(stdout_log)
-            kwargs["stdout"] = stdout_log
-        if "stderr" not in kwargs:
-            stderr_log = open(self.log_dir / f"{name}.stderr.log", "w")
-            self.log_files.append(stderr_log)
-            kwargs["stderr"] = stderr_log
-
-        proc = subprocess.Popen(cmd, env=full_env, **kwargs)
+        # Log stdout/stderr to files unless caller provides their own. The
+        # child gets its own copy of each fd, so ours are closed right away.
+        log_fds: list[int] = []
+        for stream in ("stdout", "stderr"):
+            if stream not in kwargs:
+                fd = os.open(
+                    f"{name}.{stream}.log",
+                    os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC,
+                    0o644,
+                    dir_fd=self.log_dir_fd,
+                )
+                log_fds.append(fd)
+                kwargs[stream] = fd
+
+        try:
+            proc = subprocess.Popen(resolve_command(cmd), env=full_env, **kwargs)
+        finally:
+            for fd in log_fds:
+                os.close(fd)
         self.processes.append(ManagedProcess(name, proc))
         print(f"  Started {name} (pid {proc.pid})")
         return proc
 
+    def report_exit(self, mp: ManagedProcess):
+        """Report a dead process, once. Exits caused by cleanup are not reported."""
+        if mp.reported_dead or self.cleaned_up:
+            return
+        mp.reported_dead = True
+        exit_code = mp.proc.returncode
+        print(f"DIED: {mp.name} (pid {mp.pid}) exited with code {exit_code}")
+        print(f"      Check logs: {self.log_dir}/{mp.name}.stderr.log")
+
     def check_processes(self):
         """Check for dead processes and report them once."""
         for mp in self.processes:
-            if mp.proc.poll() is not None and not mp.reported_dead:
-                mp.reported_dead = True
-                exit_code = mp.proc.returncode
-                print(f"DIED: {mp.name} (pid {mp.pid}) exited with code {exit_code}")
-                print(f"      Check logs: {self.log_dir}/{mp.name}.stderr.log")
+            if not mp.reported_dead and mp.proc.poll() is not None:
+                self.report_exit(mp)
+
+    async def watch_processes(self):
+        """Report processes as they die, until cancelled.
+
+        On Linux each child's exit is awaited through a pidfd, so we only wake
+        when a child actually exits. Elsewhere, poll every 2 seconds.
+        """
+        pidfds: dict[ManagedProcess, int] = {}
+        try:
+            for mp in self.processes:
+                if mp.proc.poll() is None:
+                    pidfds[mp] = os.pidfd_open(mp.pid)
+        except (AttributeError, OSError):
+            # No pidfd support (non-Linux or kernel < 5.3)
+            for pidfd in pidfds.values():
+                os.close(pidfd)
+            while True:
+                self.check_processes()
+                await asyncio.sleep(2)
+
+        self.check_processes()  # Anything that died before we started watching
+        exits = [asyncio.create_task(_wait_for_pidfd(mp, pidfd)) for mp, pidfd in pidfds.items()]
+        while exits:
+            done, pending = await asyncio.wait(exits, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                self.report_exit(task.result())
+            exits = list(pending)
+
+        await asyncio.Event().wait()
 
     def cleanup(self):
         if self.cleaned_up:
@@ -97,49 +174,69 @@ class SetupSession:
                 except subprocess.TimeoutExpired:
                     mp.proc.kill()
 
-        for log_file in self.log_files:
-            try:
-                log_file.close()
-            except Exception:
-                pass
+        try:
+            os.close(self.log_dir_fd)
+        except OSError:
+            pass
 
         for temp_dir in self.temp_dirs:
             shutil.rmtree(temp_dir, ignore_errors=True)
 
 
+# Files and directories of downloads still in flight, removed if we're interrupted
+_partial_downloads: set[Path] = set()
+
+
 def download_file(url: str, dest: Path, desc: str) -> bool:
-    """Download a file with progress indication."""
+    """Download a file with progress indication.
+
+    The file is fetched to a temporary sibling and moved into place once
+    complete, so a failed or interrupted download never leaves a truncated `dest`.
+    """
     print(f"  Downloading {desc}...")
+    partial = dest.with_name(f"{dest.name}.part")
+    _partial_downloads.add(partial)
     try:
         dest.parent.mkdir(parents=True, exist_ok=True)
-        urllib.request.urlretrieve(url, dest)
+        with urllib.request.urlopen(url) as response, open(partial, "wb") as out:
+            shutil.copyfileobj(response, out, 1 << 20)
+        partial.replace(dest)
         return True
     except Exception as e:
-        print(f"  Failed: {e}")
+        print(f"  Failed to download {desc}: {e}")
+        partial.unlink(missing_ok=True)
         return False
+    finally:
+        _partial_downloads.discard(partial)
+
+
+def remove_partial_downloads():
+    """Delete the partial files and directories of downloads that are still running."""
+    for partial in list(_partial_downloads):
+        if partial.is_dir():
+            shutil.rmtree(partial, ignore_errors=True)
+        else:
+            partial.unlink(missing_ok=True)
 
 
 def ensure_cloudflared() -> Path | None:
     """Download cloudflared if not available."""
-    if shutil.which("cloudflared"):
-        return Path(shutil.which("cloudflared"))  # type: ignore
+    system_cloudflared = shutil.which("cloudflared")
+    if system_cloudflared:
+        return Path(system_cloudflared)
 
     cached = CACHE_DIR / "bin" / "cloudflared"
     if cached.exists() and os.access(cached, os.X_OK):
         return cached
 
-    system = platform.system().lower()
-    machine = platform.machine().lower()
+    arch = _CLOUDFLARED_ARCHES.get(_MACHINE, _MACHINE)
 
-    arch_map = {"x86_64": "amd64", "aarch64": "arm64", "arm64": "arm64"}
-    arch = arch_map.get(machine, machine)
-
-    if system == "linux":
+    if _SYSTEM == "linux":
         filename = f"cloudflared-linux-{arch}"
-    elif system == "darwin":
+    elif _SYSTEM == "darwin":
         filename = f"cloudflared-darwin-{arch}"
     else:
-        print(f"  Unsupported platform: {system}/{machine}")
+        print(f"  Unsupported platform: {_SYSTEM}/{_MACHINE}")
         return None
 
     url = f"https://github.com/cloudflare/cloudflared/releases/download/{CLOUDFLARED_VERSION}/{filename}"
@@ -169,29 +266,53 @@ def ensure_novnc() -> Path | None:
 
     url = f"https://github.com/novnc/noVNC/archive/refs/tags/v{NOVNC_VERSION}.zip"
     zip_path = CACHE_DIR / "novnc.zip"
-
-    if not download_file(url, zip_path, "noVNC"):
-        return None
+    # Extract next to the final location and move it into place once complete,
+    # so an interrupted extraction never leaves a half-populated `cached`
+    staging = cached.with_name(f"{cached.name}.part")
+    _partial_downloads.update((zip_path, staging))
 
     try:
-        cached.mkdir(parents=True, exist_ok=True)
+        if not download_file(url, zip_path, "noVNC"):
+            return None
+
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
         with zipfile.ZipFile(zip_path) as zf:
             for member in zf.namelist():
                 # Strip the top-level directory from paths
                 parts = member.split("/", 1)
                 if len(parts) > 1 and parts[1]:
-                    target = cached / parts[1]
+                    target = staging / parts[1]
                     if member.endswith("/"):
                         target.mkdir(parents=True, exist_ok=True)
                     else:
                         target.parent.mkdir(parents=True, exist_ok=True)
                         with zf.open(member) as src, open(target, "wb") as dst:
-                            dst.write(src.read())
-        zip_path.unlink()
+                            shutil.copyfileobj(src, dst, 1 << 16)
+        # Drop any incomplete tree left by an older version of this tool
+        shutil.rmtree(cached, ignore_errors=True)
+        staging.replace(cached)
         return cached
     except Exception as e:
         print(f"  Failed to extract noVNC: {e}")
+        shutil.rmtree(staging, ignore_errors=True)
         return None
+    finally:
+        zip_path.unlink(missing_ok=True)
+        _partial_downloads.difference_update((zip_path, staging))
+
+
+def resolve_command(cmd: list[str]) -> list[str]:
+    """Return cmd with its program resolved to a full path, if found on PATH.
+
+    subprocess only uses posix_spawn (vfork+exec instead of forking this whole
+    process) when it is given an explicit path to the executable. With the
+    default close_fds=True that fast path also needs Python 3.13+.
+    """
+    if os.path.dirname(cmd[0]):
+        return cmd
+    program = shutil.which(cmd[0])
+    return [program, *cmd[1:]] if program else cmd
 
 
 def check_command(name: str) -> bool:
@@ -278,7 +399,7 @@ def create_vnc_passwd_file(password: str, path: Path) -> bool:
     try:
         # TigerVNC's vncpasswd can read from stdin with -f flag
         result = subprocess.run(
-            ["vncpasswd", "-f"],
+            resolve_command(["vncpasswd", "-f"]),
             input=password.encode(),
             capture_output=True,
             check=True,
@@ -290,42 +411,78 @@ def create_vnc_passwd_file(password: str, path: Path) -> bool:
         return False
 
 
-def wait_for_port(port: int, timeout: float = 10.0) -> bool:
-    """Wait for a port to become available."""
-    import socket
-
-    start = time.time()
-    while time.time() - start < timeout:
+async def _wait_for_port(port: int, deadline: float) -> bool:
+    """Retry connecting to a local port until it accepts or the deadline passes."""
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
         try:
-            with socket.create_connection(("localhost", port), timeout=1):
-                return True
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection("localhost", port), timeout=1.0
+            )
         except (ConnectionRefusedError, TimeoutError, OSError):
-            time.sleep(0.2)
+            await asyncio.sleep(0.2)
+            continue
+        writer.close()
+        return True
     return False
 
 
+def wait_for_ports(ports: list[int], timeout: float = 10.0) -> list[int]:
+    """Wait for several ports at once. Returns the ports that never came up."""
+
+    async def wait_all() -> list[int]:
+        deadline = asyncio.get_running_loop().time() + timeout
+        results = await asyncio.gather(*(_wait_for_port(port, deadline) for port in ports))
+        return [port for port, ready in zip(ports, results) if not ready]
+
+    return asyncio.run(wait_all())
+
+
+def enlarge_pipe(pipe: IO[bytes] | None, size: int = 1 << 20):
+    """Grow a pipe's kernel buffer (Linux only) so the writer can burst without blocking."""
+    if pipe is None or not hasattr(fcntl, "F_SETPIPE_SZ"):
+        return
+    try:
+        fcntl.fcntl(pipe.fileno(), fcntl.F_SETPIPE_SZ, size)
+    except OSError:
+        pass  # Above /proc/sys/fs/pipe-max-size; keep the default buffer
+
+
 def extract_tunnel_url(proc: subprocess.Popen, log_path: Path, timeout: float = 30.0) -> str | None:
     """Read cloudflared output to find the tunnel URL, also logging to file."""
-    import select
-
-    url_pattern = re.compile(r"https://[a-zA-Z0-9-]+\.trycloudflare\.com")
+    if proc.stderr is None:
+        return None
 
-    start = time.time()
+    fd = proc.stderr.fileno()
+    os.set_blocking(fd, False)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    deadline = time.monotonic() + timeout
 
-    with open(log_path, "w") as log_file:
-        while time.time() - start < timeout:
+    with open(log_path, "w") as log_file, selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while (remaining := deadline - time.monotonic()) > 0:
             if proc.poll() is not None:
                 return None
 
-            if proc.stderr and select.select([proc.stderr], [], [], 0.5)[0]:
-                line = proc.stderr.readline()
-                if line:
-                    decoded = line.decode("utf-8", errors="replace")
-                    log_file.write(decoded)
-                    log_file.flush()
-                    match = url_pattern.search(decoded)
-                    if match:
-                        return match.group(0)
+            if not selector.select(min(remaining, 0.5)):
+                continue
+            try:
+                chunk = os.read(fd, 4096)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                return None
+
+            decoded = decoder.decode(chunk)
+            log_file.write(decoded)
+            log_file.flush()
+            pending += decoded
+            match = _TUNNEL_URL_RE.search(pending)
+            if match:
+                return match.group(0)
+            # Keep the unfinished last line in case the URL is split across reads
+            pending = pending[pending.rfind("\n") + 1 :]
 
     return None
 
@@ -368,15 +525,18 @@ def main():
     session = SetupSession()
 
     def signal_handler(_sig, _frame):
-        print("\n\nShutting down...")
+        print("\n\nShutting down...", flush=True)
         session.cleanup()
-        sys.exit(0)
+        remove_partial_downloads()
+        # Exit without joining worker threads: a download in progress on the
+        # dependency pool can't be interrupted and would otherwise hold us here.
+        os._exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     atexit.register(session.cleanup)
 
-    # Find available browsers and terminal
+    # Cheap PATH checks first, so a missing dependency fails before any download
     browsers = find_available_browsers()
     terminal = find_terminal()
 
@@ -386,12 +546,6 @@ def main():
         print("Or a terminal (xterm, gnome-terminal, konsole)")
         sys.exit(1)
 
-    # Let user choose what to launch
-    app_type, app_cmd = prompt_app_choice(browsers, terminal)
-    if app_type == "none":
-        print("ERROR: No application selected")
-        sys.exit(1)
-
     # Check for X server with VNC
     use_xvnc = has_xvnc()
     use_xvfb = has_xvfb_x11vnc()
@@ -400,8 +554,30 @@ def main():
         print_install_instructions()
         sys.exit(1)
 
+    # Run the slow probes concurrently: the websockify check forks an
+    # interpreter and cloudflared/noVNC may need to be downloaded.
+    print("Checking dependencies...")
+    executor = ThreadPoolExecutor(max_workers=3)
+    try:
+        websockify_future = executor.submit(check_websockify)
+        cloudflared_future = executor.submit(ensure_cloudflared)
+        novnc_future = executor.submit(ensure_novnc)
+
+        has_websockify = websockify_future.result()
+        cloudflared = cloudflared_future.result()
+        novnc_path = novnc_future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    print()
+
+    # Let user choose what to launch
+    app_type, app_cmd = prompt_app_choice(browsers, terminal)
+    if app_type == "none":
+        print("ERROR: No application selected")
+        sys.exit(1)
+
     # Check/install websockify
-    if not check_websockify():
+    if not has_websockify:
         print("Installing websockify...")
         result = subprocess.run(
             [sys.executable, "-m", "pip", "install", "websockify"],
@@ -412,21 +588,15 @@ def main():
             print("Try: pip install websockify")
             sys.exit(1)
 
-    # Download cloudflared if needed
-    print("Checking cloudflared...")
-    cloudflared = ensure_cloudflared()
     if not cloudflared:
         print("ERROR: Could not find or download cloudflared")
         sys.exit(1)
-    print(f"  Using: {cloudflared}")
+    print(f"Using cloudflared: {cloudflared}")
 
-    # Download noVNC if needed
-    print("Checking noVNC...")
-    novnc_path = ensure_novnc()
     if not novnc_path:
         print("ERROR: Could not find or download noVNC")
         sys.exit(1)
-    print(f"  Using: {novnc_path}")
+    print(f"Using noVNC: {novnc_path}")
 
     # Generate VNC password
     vnc_password = generate_password(8)
@@ -500,23 +670,8 @@ def main():
             name="x11vnc",
         )
 
-    time.sleep(1)
-    if not wait_for_port(vnc_port):
-        print("ERROR: VNC server failed to start on port", vnc_port)
-        sys.exit(1)
-
-    display_env = {"DISPLAY": session.display}
-
-    # Start the selected application
-    print(f"Starting {app_cmd[0]}...")
-    session.spawn(
-        app_cmd,
-        name="app",
-        env=display_env,
-    )
-    time.sleep(1)
-
-    # Start noVNC via websockify
+    # websockify and cloudflared only connect to their upstream once a client
+    # arrives, so start them now and let them come up alongside the VNC server.
     print("Starting noVNC web server...")
     novnc_port = 6080
     session.spawn(
@@ -532,17 +687,32 @@ def main():
         name="websockify",
     )
 
-    if not wait_for_port(novnc_port):
-        print("ERROR: noVNC/websockify failed to start")
-        sys.exit(1)
-
-    # Start cloudflared tunnel
     print("Starting cloudflared tunnel...")
     tunnel = session.spawn(
         [str(cloudflared), "tunnel", "--url", f"http://localhost:{novnc_port}"],
         name="cloudflared",
         stderr=subprocess.PIPE,  # Need to read stderr for URL extraction
     )
+    # Nothing reads stderr until the ports are up and the app has started
+    enlarge_pipe(tunnel.stderr)
+
+    failed_ports = wait_for_ports([vnc_port, novnc_port])
+    if vnc_port in failed_ports:
+        print("ERROR: VNC server failed to start on port", vnc_port)
+        sys.exit(1)
+    if novnc_port in failed_ports:
+        print("ERROR: noVNC/websockify failed to start")
+        sys.exit(1)
+
+    display_env = {"DISPLAY": session.display}
+
+    # Start the selected application
+    print(f"Starting {app_cmd[0]}...")
+    session.spawn(
+        app_cmd,
+        name="app",
+        env=display_env,
+    )
 
     tunnel_url = extract_tunnel_url(tunnel, session.log_dir / "cloudflared.stderr.log")
     if not tunnel_url:
@@ -575,9 +745,7 @@ def main():
     print()
     print("Waiting... (Ctrl+C to stop)")
 
-    while True:
-        session.check_processes()
-        time.sleep(2)
+    asyncio.run(session.watch_processes())
 
 
 if __name__ == "__main__":
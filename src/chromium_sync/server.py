@@ -5,8 +5,12 @@ Reads directly from local browser profile files.
 """
 
 import asyncio
+import json
 import os
 import sys
+import threading
+from collections.abc import Callable, Iterator
+from itertools import chain
 from pathlib import Path
 from typing import Any
 
@@ -34,6 +38,11 @@ app = Server("chromium-sync")
 _reader: LocalReader | None = None
 _pending_profiles: dict[str, Path] | None = None
 
+# LocalReader copies profile files to fixed names in its temp dir, so reads
+# must not overlap. The lock is held by the worker thread itself, so a
+# cancelled tool call keeps it until its read has actually finished.
+_reader_lock = threading.Lock()
+
 
 def get_reader() -> LocalReader | None:
     """Get the reader, or None if profile selection is pending."""
@@ -89,158 +98,235 @@ def format_profile_selection_prompt(profiles: dict[str, Path]) -> str:
     return "\n".join(lines)
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available sync tools."""
-    return [
-        Tool(
-            name="select_browser",
-            description=(
-                "Select which browser to use when multiple are installed. "
-                "Use this when prompted to choose between browsers."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "browser": {
-                        "type": "string",
-                        "description": "Browser to use: 'chrome', 'chromium', or 'brave'",
-                    },
-                    "save_default": {
-                        "type": "boolean",
-                        "description": "Save this choice as the default for future sessions",
-                        "default": False,
-                    },
-                },
-                "required": ["browser"],
-            },
+# Tool definitions are static, so build them once rather than per request
+_TOOLS = [
+    Tool(
+        name="select_browser",
+        description=(
+            "Select which browser to use when multiple are installed. "
+            "Use this when prompted to choose between browsers."
         ),
-        Tool(
-            name="set_profile_path",
-            description="Manually set the browser profile path.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "path": {
-                        "type": "string",
-                        "description": "Absolute path to the browser profile directory",
-                    },
-                    "save_default": {
-                        "type": "boolean",
-                        "description": "Save this path as the default for future sessions",
-                        "default": False,
-                    },
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "browser": {
+                    "type": "string",
+                    "description": "Browser to use: 'chrome', 'chromium', or 'brave'",
+                },
+                "save_default": {
+                    "type": "boolean",
+                    "description": "Save this choice as the default for future sessions",
+                    "default": False,
                 },
-                "required": ["path"],
             },
-        ),
-        Tool(
-            name="get_tabs_all_devices",
-            description=(
-                "Get open tabs from all synced devices. "
-                "Returns a list of devices with their open tabs."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {},
+            "required": ["browser"],
+        },
+    ),
+    Tool(
+        name="set_profile_path",
+        description="Manually set the browser profile path.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "path": {
+                    "type": "string",
+                    "description": "Absolute path to the browser profile directory",
+                },
+                "save_default": {
+                    "type": "boolean",
+                    "description": "Save this path as the default for future sessions",
+                    "default": False,
+                },
             },
+            "required": ["path"],
+        },
+    ),
+    Tool(
+        name="get_tabs_all_devices",
+        description=(
+            "Get open tabs from all synced devices. Returns a list of devices with their open tabs."
         ),
-        Tool(
-            name="get_tabs_local",
-            description="Get open tabs from the current local browser session.",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-            },
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        },
+    ),
+    Tool(
+        name="get_tabs_local",
+        description="Get open tabs from the current local browser session.",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        },
+    ),
+    Tool(
+        name="get_history",
+        description=(
+            "Search browsing history. Returns JSON array of entries. "
+            "Supports substring search, regex patterns, and date filtering."
         ),
-        Tool(
-            name="get_history",
-            description=(
-                "Search browsing history. Returns JSON array of entries. "
-                "Supports substring search, regex patterns, and date filtering."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": (
-                            "Substring to search for in URLs and titles (case-insensitive). "
-                            "Cannot be used with 'pattern'."
-                        ),
-                    },
-                    "pattern": {
-                        "type": "string",
-                        "description": (
-                            "Regex pattern to match against URLs and titles. "
-                            "Cannot be used with 'query'."
-                        ),
-                    },
-                    "limit": {
-                        "type": "integer",
-                        "description": "Maximum number of results to return. Default 100.",
-                        "default": 100,
-                    },
-                    "days_back": {
-                        "type": "integer",
-                        "description": "Only return history from the last N days.",
-                    },
-                    "after": {
-                        "type": "string",
-                        "description": (
-                            "ISO date or datetime (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS). "
-                            "Only return entries on or after this time."
-                        ),
-                    },
-                    "before": {
-                        "type": "string",
-                        "description": (
-                            "ISO date or datetime (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS). "
-                            "Only return entries before this time."
-                        ),
-                    },
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": (
+                        "Substring to search for in URLs and titles (case-insensitive). "
+                        "Cannot be used with 'pattern'."
+                    ),
                 },
-            },
-        ),
-        Tool(
-            name="get_bookmarks",
-            description="Get bookmarks. Optionally filter by parent folder ID.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "folder": {
-                        "type": "string",
-                        "description": (
-                            "Parent folder ID to filter by. "
-                            "Optional - returns all bookmarks if not specified."
-                        ),
-                    },
+                "pattern": {
+                    "type": "string",
+                    "description": (
+                        "Regex pattern to match against URLs and titles. "
+                        "Cannot be used with 'query'."
+                    ),
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of results to return. Default 100.",
+                    "default": 100,
+                },
+                "days_back": {
+                    "type": "integer",
+                    "description": "Only return history from the last N days.",
+                },
+                "after": {
+                    "type": "string",
+                    "description": (
+                        "ISO date or datetime (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS). "
+                        "Only return entries on or after this time."
+                    ),
+                },
+                "before": {
+                    "type": "string",
+                    "description": (
+                        "ISO date or datetime (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS). "
+                        "Only return entries before this time."
+                    ),
                 },
             },
-        ),
-        Tool(
-            name="search_bookmarks",
-            description="Search bookmarks by title or URL.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Text to search for in bookmark titles and URLs.",
-                    },
+        },
+    ),
+    Tool(
+        name="get_bookmarks",
+        description="Get bookmarks. Optionally filter by parent folder ID.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "folder": {
+                    "type": "string",
+                    "description": (
+                        "Parent folder ID to filter by. "
+                        "Optional - returns all bookmarks if not specified."
+                    ),
                 },
-                "required": ["query"],
             },
-        ),
-        Tool(
-            name="check_sync_status",
-            description="Check what browser data is accessible. Useful for debugging.",
-            inputSchema={
-                "type": "object",
-                "properties": {},
+        },
+    ),
+    Tool(
+        name="search_bookmarks",
+        description="Search bookmarks by title or URL.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Text to search for in bookmark titles and URLs.",
+                },
             },
-        ),
-    ]
+            "required": ["query"],
+        },
+    ),
+    Tool(
+        name="check_sync_status",
+        description="Check what browser data is accessible. Useful for debugging.",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        },
+    ),
+]
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available sync tools."""
+    return _TOOLS
+
+
+def with_setup_hint_if_empty(reader: LocalReader, result: str, data: list) -> str:
+    """Append setup hint if data is empty and profile isn't initialized."""
+    if not data and not reader.is_profile_initialized():
+        return f"{result}\n\n{SETUP_HINT}"
+    return result
+
+
+def _get_tabs_all_devices(reader: LocalReader, arguments: dict[str, Any]) -> str:
+    devices = reader.get_tabs()
+    if not devices:
+        return (
+            "Profile found but no synced devices detected. "
+            "You'll only be able to access browser data from this machine.\n\n"
+            "You should be able to enable sync from your browser's settings.\n\n"
+            f"{SETUP_HINT}"
+        )
+    return format_devices(devices)
+
+
+def _get_tabs_local(reader: LocalReader, arguments: dict[str, Any]) -> str:
+    tabs = reader.get_local_tabs()
+    return with_setup_hint_if_empty(reader, format_local_tabs(tabs), tabs)
+
+
+def _get_history(reader: LocalReader, arguments: dict[str, Any]) -> str:
+    try:
+        history = reader.get_history(
+            query=arguments.get("query"),
+            pattern=arguments.get("pattern"),
+            limit=arguments.get("limit", 100),
+            days_back=arguments.get("days_back"),
+            after=arguments.get("after"),
+            before=arguments.get("before"),
+        )
+    except ValueError as e:
+        return f"Error: {e}"
+
+    return with_setup_hint_if_empty(reader, format_history(history), history)
+
+
+def _get_bookmarks(reader: LocalReader, arguments: dict[str, Any]) -> str:
+    bookmarks = reader.get_bookmarks(folder_id=arguments.get("folder"))
+    return with_setup_hint_if_empty(reader, format_bookmarks(bookmarks), bookmarks)
+
+
+def _search_bookmarks(reader: LocalReader, arguments: dict[str, Any]) -> str:
+    bookmarks = reader.search_bookmarks(arguments.get("query", ""))
+    return with_setup_hint_if_empty(reader, format_bookmarks(bookmarks), bookmarks)
+
+
+def _check_sync_status(reader: LocalReader, arguments: dict[str, Any]) -> str:
+    return check_sync_status(reader)
+
+
+def _run_locked(
+    handler: Callable[[LocalReader, dict[str, Any]], str],
+    reader: LocalReader,
+    arguments: dict[str, Any],
+) -> str:
+    with _reader_lock:
+        return handler(reader, arguments)
+
+
+# Tools that read from the browser profile, keyed by tool name
+_READER_TOOLS: dict[str, Callable[[LocalReader, dict[str, Any]], str]] = {
+    "get_tabs_all_devices": _get_tabs_all_devices,
+    "get_tabs_local": _get_tabs_local,
+    "get_history": _get_history,
+    "get_bookmarks": _get_bookmarks,
+    "search_bookmarks": _search_bookmarks,
+    "check_sync_status": _check_sync_status,
+}
 
 
 @app.call_tool()
@@ -269,7 +355,11 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> list[TextContent]:
         saved_msg = f" Saved to {CONFIG_FILE}" if save_default else ""
         return [TextContent(type="text", text=f"Set profile path to {path}.{saved_msg}")]
 
-    # For all other tools, we need a reader
+    handler = _READER_TOOLS.get(name)
+    if handler is None:
+        return [TextContent(type="text", text=f"Unknown tool: {name}")]
+
+    # Every remaining tool reads from the browser profile
     reader = get_reader()
 
     if reader is None and _pending_profiles:
@@ -279,71 +369,9 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> list[TextContent]:
     if reader is None:
         return [TextContent(type="text", text=f"No browser profile found.\n\n{SETUP_HINT}")]
 
-    def with_setup_hint_if_empty(result: str, data: list) -> str:
-        """Append setup hint if data is empty and profile isn't initialized."""
-        if not data and not reader.is_profile_initialized():
-            return f"{result}\n\n{SETUP_HINT}"
-        return result
-
-    if name == "get_tabs_all_devices":
-        devices = reader.get_tabs()
-        if not devices:
-            result = (
-                "Profile found but no synced devices detected. "
-                "You'll only be able to access browser data from this machine.\n\n"
-                "You should be able to enable sync from your browser's settings.\n\n"
-                f"{SETUP_HINT}"
-            )
-        else:
-            result = format_devices(devices)
-        return [TextContent(type="text", text=result)]
-
-    elif name == "get_tabs_local":
-        tabs = reader.get_local_tabs()
-        result = with_setup_hint_if_empty(format_local_tabs(tabs), tabs)
-        return [TextContent(type="text", text=result)]
-
-    elif name == "get_history":
-        query = arguments.get("query")
-        pattern = arguments.get("pattern")
-        limit = arguments.get("limit", 100)
-        days_back = arguments.get("days_back")
-        after = arguments.get("after")
-        before = arguments.get("before")
-
-        try:
-            history = reader.get_history(
-                query=query,
-                pattern=pattern,
-                limit=limit,
-                days_back=days_back,
-                after=after,
-                before=before,
-            )
-        except ValueError as e:
-            return [TextContent(type="text", text=f"Error: {e}")]
-
-        result = with_setup_hint_if_empty(format_history(history), history)
-        return [TextContent(type="text", text=result)]
-
-    elif name == "get_bookmarks":
-        folder = arguments.get("folder")
-        bookmarks = reader.get_bookmarks(folder_id=folder)
-        result = with_setup_hint_if_empty(format_bookmarks(bookmarks), bookmarks)
-        return [TextContent(type="text", text=result)]
-
-    elif name == "search_bookmarks":
-        query = arguments.get("query", "")
-        bookmarks = reader.search_bookmarks(query)
-        result = with_setup_hint_if_empty(format_bookmarks(bookmarks), bookmarks)
-        return [TextContent(type="text", text=result)]
-
-    elif name == "check_sync_status":
-        result = check_sync_status(reader)
-        return [TextContent(type="text", text=result)]
-
-    else:
-        return [TextContent(type="text", text=f"Unknown tool: {name}")]
+    # Profile reads hit SQLite/LevelDB and copy files, so keep them off the event loop
+    result = await asyncio.to_thread(_run_locked, handler, reader, arguments)
+    return [TextContent(type="text", text=result)]
 
 
 SETUP_HINT = """
@@ -355,24 +383,26 @@ uvx --with chromium-sync-mcp[setup] \\
 """.strip()
 
 
+def _format_tab(tab: Tab) -> str:
+    """Format a tab as a markdown link, or a bare URL if it has no title."""
+    return f"- [{tab.title}]({tab.url})" if tab.title else f"- {tab.url}"
+
+
+def _device_lines(devices: list[Device]) -> Iterator[str]:
+    for device in devices:
+        yield f"\n## {device.name} ({device.device_type})"
+        if not device.tabs:
+            yield "  No open tabs"
+        for tab in device.tabs:
+            yield f"  {_format_tab(tab)}"
+
+
 def format_devices(devices: list[Device]) -> str:
     """Format devices and tabs for display."""
     if not devices:
         return "No synced devices found."
 
-    lines = []
-    for device in devices:
-        lines.append(f"\n## {device.name} ({device.device_type})")
-        if not device.tabs:
-            lines.append("  No open tabs")
-        else:
-            for tab in device.tabs:
-                if tab.title:
-                    lines.append(f"  - [{tab.title}]({tab.url})")
-                else:
-                    lines.append(f"  - {tab.url}")
-
-    return "\n".join(lines)
+    return "\n".join(_device_lines(devices))
 
 
 def format_local_tabs(tabs: list[Tab]) -> str:
@@ -380,20 +410,12 @@ def format_local_tabs(tabs: list[Tab]) -> str:
     if not tabs:
         return "No open tabs found."
 
-    lines = [f"Found {len(tabs)} open tabs:\n"]
-    for tab in tabs:
-        if tab.title:
-            lines.append(f"- [{tab.title}]({tab.url})")
-        else:
-            lines.append(f"- {tab.url}")
-
-    return "\n".join(lines)
+    header = f"Found {len(tabs)} open tabs:\n"
+    return "\n".join(chain((header,), map(_format_tab, tabs)))
 
 
 def format_history(history: list[HistoryEntry]) -> str:
     """Format history entries as JSON array."""
-    import json
-
     entries = [
         {
             "url": entry.url,
@@ -406,19 +428,19 @@ def format_history(history: list[HistoryEntry]) -> str:
     return json.dumps(entries)
 
 
+def _format_bookmark(bookmark: Bookmark) -> str:
+    if bookmark.is_folder:
+        return f"- [folder] {bookmark.title} (id: {bookmark.id})"
+    return f"- [{bookmark.title}]({bookmark.url})"
+
+
 def format_bookmarks(bookmarks: list[Bookmark]) -> str:
     """Format bookmarks for display."""
     if not bookmarks:
         return "No bookmarks found."
 
-    lines = [f"Found {len(bookmarks)} bookmarks:\n"]
-    for bookmark in bookmarks:
-        if bookmark.is_folder:
-            lines.append(f"- [folder] {bookmark.title} (id: {bookmark.id})")
-        else:
-            lines.append(f"- [{bookmark.title}]({bookmark.url})")
-
-    return "\n".join(lines)
+    header = f"Found {len(bookmarks)} bookmarks:\n"
+    return "\n".join(chain((header,), map(_format_bookmark, bookmarks)))
 
 
 def check_sync_status(reader: LocalReader) -> str:
@@ -0,0 +1,57 @@
+"""Tests for the passphrase setup helpers."""
+
+import subprocess
+import sys
+
+from chromium_sync.passphrase_setup import extract_tunnel_url
+
+SPLIT_URL_SCRIPT = r"""
+import sys, time
+err = sys.stderr.buffer
+err.write(b"INF Requesting new quick Tunnel on trycloudflare.com...\n")
+err.write(b"INF |  caf\xc3")
+err.flush()
+time.sleep(0.3)
+err.write(b"\xa9 https://quick-brown")
+err.flush()
+time.sleep(0.3)
+err.write(b"-fox.trycloudflare.com  |\n")
+err.flush()
+time.sleep(10)
+"""
+
+NO_URL_SCRIPT = r"""
+import sys
+sys.stderr.write("ERR failed to request quick Tunnel\n")
+sys.exit(1)
+"""
+
+
+def spawn_python(script: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-c", script], stderr=subprocess.PIPE)
+
+
+def test_extract_tunnel_url_joins_url_split_across_reads(tmp_path):
+    log_path = tmp_path / "cloudflared.stderr.log"
+    proc = spawn_python(SPLIT_URL_SCRIPT)
+    try:
+        url = extract_tunnel_url(proc, log_path, timeout=5)
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert url == "https://quick-brown-fox.trycloudflare.com"
+    log = log_path.read_text()
+    assert "Requesting new quick Tunnel" in log
+    assert "café" in log  # Multi-byte character split across reads
+
+
+def test_extract_tunnel_url_returns_none_when_process_exits(tmp_path):
+    log_path = tmp_path / "cloudflared.stderr.log"
+    proc = spawn_python(NO_URL_SCRIPT)
+    try:
+        url = extract_tunnel_url(proc, log_path, timeout=5)
+    finally:
+        proc.wait()
+
+    assert url is None